@@ -1,29 +1,46 @@
 import sys
 import os
+import errno
 import shutil
-from pathlib import Path
-from typing import List, Tuple
+import tempfile
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLineEdit, QTextEdit, QLabel, QFileDialog,
     QProgressBar, QMessageBox
 )
 from PyQt6.QtCore import QThread, pyqtSignal, Qt
-from PyQt6.QtGui import QFont
+from PyQt6.QtGui import QColor, QFont, QPalette
+
+try:
+    import ahocorasick  # Optional: faster similar-file search for huge folders
+except ImportError:
+    ahocorasick = None
 
 
 class ExactMatchWorker(QThread):
     """Worker thread for exact-match ROM file moving"""
     progress = pyqtSignal(int, int)  # current, total
     status = pyqtSignal(str)
-    finished = pyqtSignal(list)  # list of results
+    finished = pyqtSignal(list, dict)  # list of results, outcome counts
     
     def __init__(self, source_dir: str, target_dir: str, rom_names: List[str]):
         super().__init__()
         self.source_dir = source_dir
         self.target_dir = target_dir
+        self.target_prefix = os.path.join(target_dir, '')  # Ends with a separator; filenames are appended directly
         self.rom_names = rom_names
         self.is_running = True
+        self.file_index_lower = None  # Built on the first miss, see build_lookup_tables
+        self.lower_names = []
+        self.automaton = None
+        self.miss_cache = {}  # lowercased rom_name -> candidates for names with no exact match
+        self.same_filesystem = False
+        self.source_dir_fd = None  # Directory fds for relative renames where the OS supports them
+        self.target_dir_fd = None
         
     def stop(self):
         self.is_running = False
@@ -34,77 +51,234 @@ class ExactMatchWorker(QThread):
         moved_count = 0
         failed_count = 0
         not_found_count = 0
+        skipped_count = 0
+        last_percentage = -1
+        last_status_time = 0.0
+        
+        # Moving files onto themselves would be N no-op renames
+        try:
+            same_dir = os.path.samefile(self.source_dir, self.target_dir)
+        except OSError:
+            same_dir = False
+        if same_dir:
+            self.finished.emit(
+                ["Source and target are the same directory; nothing to move."],
+                {"moved": 0, "failed": 0, "not_found": 0, "skipped": 0}
+            )
+            return
+        
+        # Create target directory once instead of on every move
+        try:
+            os.makedirs(self.target_dir, exist_ok=True)
+        except Exception as e:
+            self.status.emit(f"Error creating target directory: {e}")
+        
+        # Same device means a move is a single rename syscall
+        try:
+            self.same_filesystem = os.stat(self.source_dir).st_dev == os.stat(self.target_dir).st_dev
+        except OSError:
+            self.same_filesystem = False
         
         # Build file index for fast lookup (filename without extension -> full path)
         file_index = self.build_file_index()
         
-        for idx, rom_name_with_dot in enumerate(self.rom_names):
+        # Match every ROM first so the moves can be batched
+        matches = []  # (rom_name, matched_file, candidates)
+        
+        # ROM names arrive already stripped of trailing dots by start_processing
+        for idx, rom_name in enumerate(self.rom_names):
             if not self.is_running:
                 break
             
-            # Remove trailing dot from ROM name
-            rom_name = rom_name_with_dot.rstrip('.')
-            
-            self.status.emit(f"Processing: {rom_name}")
-            self.progress.emit(idx + 1, total)
+            # Throttle cross-thread signals: status at most ~30 times a second, progress per percent.
+            # Matching fills the first half of the bar, moving the second
+            now = time.monotonic()
+            if now - last_status_time >= 1 / 30:
+                last_status_time = now
+                self.status.emit(f"Processing: {rom_name}")
+            percentage = (idx + 1) * 50 // total
+            if percentage != last_percentage:
+                last_percentage = percentage
+                self.progress.emit(idx + 1, total * 2)
             
             # Try to find exact match
             matched_file, candidates = self.find_exact_match(rom_name, file_index)
-            
+            matches.append((rom_name, matched_file, candidates))
+        
+        # Move all matched files, one success flag per matched ROM
+        try:
+            # Renames relative to open directory fds skip resolving both full paths per file
+            if self.same_filesystem and os.rename in os.supports_dir_fd:
+                self.open_dir_fds()
+            move_outcomes = iter(self.move_files([m[1] for m in matches if m[1]]))
+        finally:
+            self.close_dir_fds()
+        
+        for rom_name, matched_file, candidates in matches:
             if matched_file:
+                success = next(move_outcomes)
                 matched_filename = os.path.basename(matched_file)
-                success = self.move_file(matched_file)
-                if success:
-                    results.append(f"✓ MOVED: {rom_name}")
-                    results.append(f"  └─ File: {matched_filename}")
+                if success is None:
+                    # Stopped before this file was moved
+                    entry = [f"- SKIPPED (stopped): {rom_name}", f"  └─ File: {matched_filename}"]
+                    skipped_count += 1
+                elif success:
+                    entry = [f"✓ MOVED: {rom_name}", f"  └─ File: {matched_filename}"]
                     moved_count += 1
                 else:
-                    results.append(f"✗ FAILED TO MOVE: {rom_name}")
-                    results.append(f"  └─ File: {matched_filename}")
+                    entry = [f"✗ FAILED TO MOVE: {rom_name}", f"  └─ File: {matched_filename}"]
                     failed_count += 1
             else:
-                results.append(f"✗ NOT FOUND: {rom_name}")
+                entry = [f"✗ NOT FOUND: {rom_name}"]
                 if candidates:
-                    results.append(f"  └─ Similar files found (but not exact matches):")
-                    for candidate in candidates[:3]:
-                        results.append(f"     • {candidate}")
+                    entry.append(f"  └─ Similar files found (but not exact matches):")
+                    entry.extend(f"     • {candidate}" for candidate in candidates[:3])
                 not_found_count += 1
             
-            results.append("")  # Blank line between entries
+            entry.append("")  # Blank line between entries
+            results.extend(entry)
         
         # Summary
-        results.append(f"{'='*60}")
-        results.append(f"✓ Successfully moved: {moved_count}")
-        results.append(f"✗ Failed to move: {failed_count}")
-        results.append(f"✗ Not found: {not_found_count}")
+        results.extend([
+            f"{'='*60}",
+            f"✓ Successfully moved: {moved_count}",
+            f"✗ Failed to move: {failed_count}",
+            f"✗ Not found: {not_found_count}",
+        ])
+        if not self.is_running:
+            # ROMs after the stop point were never checked, so say so instead of omitting them silently
+            results.extend([
+                f"- Skipped (stopped): {skipped_count}",
+                f"Stopped by user after checking {len(matches)} of {total} ROM names",
+            ])
         results.append(f"{'='*60}")
         
-        self.finished.emit(results)
+        self.finished.emit(
+            results, {"moved": moved_count, "failed": failed_count, "not_found": not_found_count,
+                      "skipped": skipped_count}
+        )
+    
+    def open_dir_fds(self):
+        """Open the source and target directories for dir_fd-relative renames"""
+        flags = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_CLOEXEC', 0)
+        try:
+            self.source_dir_fd = os.open(self.source_dir, flags)
+            self.target_dir_fd = os.open(self.target_dir, flags)
+        except OSError:
+            # Fall back to full-path renames
+            self.close_dir_fds()
+    
+    def close_dir_fds(self):
+        """Close any directory fds opened by open_dir_fds"""
+        for dir_fd in (self.source_dir_fd, self.target_dir_fd):
+            if dir_fd is not None:
+                os.close(dir_fd)
+        self.source_dir_fd = None
+        self.target_dir_fd = None
     
     def build_file_index(self) -> dict:
         """Build index of files: {name_without_ext: full_path}"""
         file_index = {}
         
-        if not os.path.exists(self.source_dir):
-            return file_index
-        
         try:
-            for filename in os.listdir(self.source_dir):
-                filepath = os.path.join(self.source_dir, filename)
-                
-                # Skip directories
-                if os.path.isdir(filepath):
-                    continue
-                
-                # Remove extension from filename
-                name_without_ext = os.path.splitext(filename)[0]
-                file_index[name_without_ext] = filepath
+            # scandir reuses readdir type info, avoiding a stat per entry (a missing folder raises here)
+            with os.scandir(self.source_dir) as entries:
+                for entry in entries:
+                    # Only index files (d_type answers this without a stat, except for symlinks)
+                    if not entry.is_file():
+                        continue
+                    
+                    # Remove extension from filename (splitext only needed for dotfiles)
+                    filename = entry.name
+                    dot = filename.rfind('.')
+                    if dot > 0 and filename[0] != '.':
+                        name_without_ext = filename[:dot]
+                    else:
+                        name_without_ext = os.path.splitext(filename)[0]
+                    file_index[name_without_ext] = entry.path
         
         except Exception as e:
             self.status.emit(f"Error building file index: {e}")
         
         return file_index
     
+    def build_lookup_tables(self, file_index: dict):
+        """Build the case-insensitive tables used when a ROM has no exact match"""
+        # Case-insensitive index for cheap lookups on misses
+        self.file_index_lower = {name.lower(): name for name in file_index}
+        # Lowercased names for the candidate scan (keeps names differing only in case)
+        self.lower_names = [(name.lower(), name) for name in file_index]
+    
+    def build_automaton(self):
+        """Build Aho-Corasick automaton and joined name blob for candidate search"""
+        automaton = ahocorasick.Automaton()
+        for name_lower, name in self.lower_names:
+            # Names that only differ in case share one pattern
+            if name_lower in automaton:
+                automaton.get(name_lower).append(name)
+            else:
+                automaton.add_word(name_lower, [name])
+        automaton.make_automaton()
+        self.automaton = automaton
+        
+        # NUL can't appear in filenames, so it safely separates names in the blob
+        self.names_offsets = []
+        offset = 0
+        for name_lower, _ in self.lower_names:
+            self.names_offsets.append(offset)
+            offset += len(name_lower) + 1
+        self.names_offsets.append(offset)
+        self.names_blob = '\0'.join(name_lower for name_lower, _ in self.lower_names)
+    
+    def find_candidates(self, rom_name_lower: str) -> List[str]:
+        """Find up to 3 file names containing, or contained in, the ROM name"""
+        candidates = []
+        
+        # Large folders get a multi-pattern matcher, built by the first search that needs it
+        if self.automaton is None and ahocorasick is not None and len(self.lower_names) >= 1000:
+            self.build_automaton()
+        
+        if self.automaton is not None and '\0' not in rom_name_lower:
+            # Longer names containing the ROM name: one C-level find over all names
+            pos = self.names_blob.find(rom_name_lower)
+            while pos != -1 and len(candidates) < 3:
+                idx = bisect_right(self.names_offsets, pos) - 1
+                candidates.append(self.lower_names[idx][1])
+                pos = self.names_blob.find(rom_name_lower, self.names_offsets[idx + 1])
+            
+            # Shorter names contained in the ROM name: a single pass over the ROM name
+            seen = set()
+            for _, names in self.automaton.iter(rom_name_lower):
+                if len(candidates) >= 3:
+                    break
+                if id(names) in seen:
+                    continue
+                seen.add(id(names))
+                candidates.extend(names[:3 - len(candidates)])
+            
+            return candidates
+        
+        rom_len = len(rom_name_lower)
+        
+        for name_lower, name_without_ext in self.lower_names:
+            # Lengths decide which containment test can possibly succeed
+            name_len = len(name_lower)
+            if name_len > rom_len:
+                if rom_name_lower not in name_lower:
+                    continue
+            elif name_len < rom_len:
+                if name_lower not in rom_name_lower:
+                    continue
+            else:
+                continue
+            
+            candidates.append(name_without_ext)
+            # Only the first 3 candidates are ever shown
+            if len(candidates) >= 3:
+                break
+        
+        return candidates
+    
     def find_exact_match(self, rom_name: str, file_index: dict) -> Tuple[str, List[str]]:
         """Find exact match for ROM name (ignoring file extension)
         Returns: (matched_file_path, list_of_similar_candidates)
@@ -113,27 +287,107 @@ class ExactMatchWorker(QThread):
         if rom_name in file_index:
             return file_index[rom_name], []
         
-        # No exact match - find similar candidates for debugging
-        candidates = []
-        rom_name_lower = rom_name.lower()
-        
-        for name_without_ext in file_index.keys():
-            if rom_name_lower in name_without_ext.lower() or name_without_ext.lower() in rom_name_lower:
-                candidates.append(name_without_ext)
+        # Suggestion tables are only needed once a ROM misses, so an all-hit run never builds them
+        if self.file_index_lower is None:
+            self.build_lookup_tables(file_index)
         
+        # Candidates only depend on the lowercased name, so names that repeat
+        # (in any casing) reuse the earlier candidate search
+        rom_name_lower = rom_name.lower()
+        if rom_name_lower in self.miss_cache:
+            return None, self.miss_cache[rom_name_lower]
+        
+        # Same name with different casing - report it without scanning the index
+        case_match = self.file_index_lower.get(rom_name_lower)
+        if case_match is not None:
+            candidates = [case_match]
+        else:
+            # No exact match - find similar candidates for debugging
+            candidates = self.find_candidates(rom_name_lower)
+        
+        self.miss_cache[rom_name_lower] = candidates
         return None, candidates
     
+    def move_files(self, source_files: List[str]) -> List[Optional[bool]]:
+        """Move matched files to the target directory
+        Returns: one success flag per file (None if stopped before it was moved)
+        """
+        outcomes = [None] * len(source_files)
+        
+        # Stopped during matching: leave every file where it is
+        if not self.is_running or not source_files:
+            return outcomes
+        
+        # Report moves as they complete (slow cross-device copies would otherwise look finished)
+        total = len(source_files)
+        done = 0
+        last_percentage = -1
+        last_status_time = 0.0
+        
+        def report_move(source_file: str):
+            nonlocal done, last_percentage, last_status_time
+            done += 1
+            now = time.monotonic()
+            if now - last_status_time >= 1 / 30:
+                last_status_time = now
+                self.status.emit(f"Moving ({done}/{total}): {os.path.basename(source_file)}")
+            # Moves fill the second half of the bar, after matching
+            percentage = done * 50 // total
+            if percentage != last_percentage:
+                last_percentage = percentage
+                self.progress.emit(total + done, total * 2)
+        
+        def move_if_running(source_file: str) -> Optional[bool]:
+            # Queued tasks re-check the flag so Stop takes effect before their rename
+            if not self.is_running:
+                return None
+            return self.move_file(source_file)
+        
+        if total > 32:
+            # Overlap rename syscalls for large batches
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = {executor.submit(move_if_running, source_file): idx
+                           for idx, source_file in enumerate(source_files)}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    idx = futures[future]
+                    outcomes[idx] = future.result()
+                    if outcomes[idx] is not None:
+                        report_move(source_files[idx])
+                    if not self.is_running:
+                        for other in futures:
+                            other.cancel()
+        else:
+            for idx, source_file in enumerate(source_files):
+                if not self.is_running:
+                    break
+                outcomes[idx] = self.move_file(source_file)
+                report_move(source_file)
+        
+        return outcomes
+    
     def move_file(self, source_file: str) -> bool:
         """Move file from source to target directory"""
         try:
-            # Create target directory if it doesn't exist
-            os.makedirs(self.target_dir, exist_ok=True)
-            
             # Get filename
             filename = os.path.basename(source_file)
-            target_path = os.path.join(self.target_dir, filename)
+            target_path = self.target_prefix + filename
             
-            # Move the file
+            # Move the file (plain rename when staying on the same filesystem)
+            if self.same_filesystem:
+                try:
+                    if self.target_dir_fd is not None:
+                        # Indexed files sit directly in the source folder, so the bare filename resolves there
+                        os.replace(filename, filename,
+                                   src_dir_fd=self.source_dir_fd, dst_dir_fd=self.target_dir_fd)
+                    else:
+                        os.replace(source_file, target_path)
+                    return True
+                except OSError as e:
+                    # st_dev can match across mounts that can't rename (e.g. overlays)
+                    if e.errno != errno.EXDEV:
+                        raise
             shutil.move(source_file, target_path)
             return True
             
@@ -240,7 +494,12 @@ class MassFileMover(QMainWindow):
         
         # Status label
         self.status_label = QLabel("Ready")
-        self.status_label.setStyleSheet("padding: 5px; background-color: #f0f0f0;")
+        # Palette instead of a stylesheet, so frequent setText calls skip CSS resolution
+        self.status_label.setContentsMargins(5, 5, 5, 5)
+        self.status_label.setAutoFillBackground(True)
+        status_palette = self.status_label.palette()
+        status_palette.setColor(QPalette.ColorRole.Window, QColor("#f0f0f0"))
+        self.status_label.setPalette(status_palette)
         layout.addWidget(self.status_label)
         
         # Results output
@@ -264,29 +523,36 @@ class MassFileMover(QMainWindow):
         if directory:
             self.target_dir_input.setText(directory)
     
-    def start_processing(self):
-        # Validate inputs
+    def validate_inputs(self) -> Tuple[Optional[str], tuple]:
+        """Read and check every input once
+        Returns: (error message or None, (source_dir, target_dir, rom_names))
+        """
         source_dir = self.source_dir_input.text().strip()
         target_dir = self.target_dir_input.text().strip()
         rom_names_text = self.rom_names_input.toPlainText().strip()
         
-        if not source_dir or not os.path.exists(source_dir):
-            QMessageBox.warning(self, "Error", "Please select a valid source directory.")
-            return
+        # Parse ROM names (one strip per line, trailing dots removed in the same pass),
+        # dropping duplicates while keeping the pasted order
+        rom_names = list(dict.fromkeys(
+            name for name in (line.strip().rstrip('.') for line in rom_names_text.splitlines()) if name
+        ))
         
+        inputs = (source_dir, target_dir, rom_names)
+        if not source_dir or not os.path.isdir(source_dir):
+            return "Please select a valid source directory.", inputs
         if not target_dir:
-            QMessageBox.warning(self, "Error", "Please select a target directory.")
-            return
-        
+            return "Please select a target directory.", inputs
         if not rom_names_text:
-            QMessageBox.warning(self, "Error", "Please enter at least one ROM name.")
-            return
-        
-        # Parse ROM names
-        rom_names = [line.strip() for line in rom_names_text.split('\n') if line.strip()]
-        
+            return "Please enter at least one ROM name.", inputs
         if not rom_names:
-            QMessageBox.warning(self, "Error", "Please enter at least one valid ROM name.")
+            return "Please enter at least one valid ROM name.", inputs
+        return None, inputs
+    
+    def start_processing(self):
+        # Validate inputs
+        error, (source_dir, target_dir, rom_names) = self.validate_inputs()
+        if error:
+            QMessageBox.warning(self, "Error", error)
             return
         
         # Disable start button, enable stop button
@@ -311,26 +577,42 @@ class MassFileMover(QMainWindow):
             self.stop_btn.setEnabled(False)
     
     def update_progress(self, current: int, total: int):
-        percentage = int((current / total) * 100)
-        self.progress_bar.setValue(percentage)
+        percentage = (current * 100) // total if total else 0
+        # Skip redundant updates so repeated values don't queue repaints
+        if percentage != self.progress_bar.value():
+            self.progress_bar.setValue(percentage)
     
     def update_status(self, status: str):
         self.status_label.setText(status)
     
-    def processing_finished(self, results: List[str]):
-        # Display results
-        self.results_output.append("\n=== PROCESSING COMPLETE ===\n")
-        for result in results:
-            self.results_output.append(result)
-        
-        # Re-enable buttons
-        self.start_btn.setEnabled(True)
-        self.stop_btn.setEnabled(False)
-        self.status_label.setText("Complete")
-        self.progress_bar.setValue(100)
+    def processing_finished(self, results: List[str], counts: dict):
+        # Hold repaints until the text, buttons and progress bar are all updated
+        self.setUpdatesEnabled(False)
+        try:
+            # Display results in one write; huge runs only show the tail
+            shown = results
+            notice = ""
+            if len(results) > 10000:
+                shown = results[-1000:]
+                notice = f"Showing the last 1000 of {len(results)} lines.\n"
+                log_path = self.save_results_log(results)
+                if log_path:
+                    notice += f"Full results saved to: {log_path}\n"
+                notice += "\n"
+            self.results_output.setPlainText(
+                "\n=== PROCESSING COMPLETE ===\n\n" + notice + "\n".join(shown)
+            )
+            
+            # Re-enable buttons
+            self.start_btn.setEnabled(True)
+            self.stop_btn.setEnabled(False)
+            self.status_label.setText("Complete")
+            self.progress_bar.setValue(100)
+        finally:
+            self.setUpdatesEnabled(True)
         
-        # Count moved files from results
-        moved_count = sum(1 for r in results if r.startswith("✓ MOVED:"))
+        # Counts come straight from the worker
+        moved_count = counts["moved"]
         
         # Show completion message
         QMessageBox.information(
@@ -339,6 +621,18 @@ class MassFileMover(QMainWindow):
             f"Finished processing!\n\n✓ {moved_count} files successfully moved\n\nCheck the results below for details."
         )
     
+    def save_results_log(self, results: List[str]) -> str:
+        """Write full results to a log file in the temp directory, returns its path"""
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", prefix="romsort_results_", suffix=".txt", delete=False
+            ) as log_file:
+                log_file.write("\n".join(results))
+            return log_file.name
+        except OSError as e:
+            self.status_label.setText(f"Error saving results log: {e}")
+            return ""
+    
     def clear_results(self):
         self.results_output.clear()
         self.progress_bar.setValue(0)